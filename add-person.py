@@ -1,6 +1,5 @@
 # import the necessary packages
 import argparse
-from imutils.video import VideoStream
 import imutils
 import time
 import cv2
@@ -10,6 +9,8 @@ from pathlib import Path
 import glob
 import json
 import utils.cvimgui as cg
+import utils.framesource as fs
+import utils.detectors as dt
 
 config = None
 
@@ -70,13 +71,16 @@ ap = argparse.ArgumentParser()
 ap.add_argument("-n", "--nick", required=True, help="Add person: unique nick-name. i.e. john")
 ap.add_argument("-f", "--full", required=True, help="New person: full-name. i.e. john doe")
 ap.add_argument("-d", "--data", required=True, help="New person: directory for the new training-data (images). will be created if not exists.")
+ap.add_argument("-s", "--source", default="0", help="frame-source: WebCam number, file:<path>, dir:<path>, synthetic[:WxH], replay:<path>, bus:<name> (see utils/framesource.py)")
 args = vars(ap.parse_args())
 
-# load face detector from disk
+# load face detector backend from config
 print("[INFO] loading face detector...")
-protoPath = config['dnnpath'] + "/deploy.prototxt"
-modelPath = config['dnnpath'] +	"/res10_300x300_ssd_iter_140000.caffemodel"
-detector = cv2.dnn.readNetFromCaffe(protoPath, modelPath)
+try:
+    detector = dt.create_detector(config)
+except dt.DetectorError as e:
+    print("ERROR. {}. Exit.".format(str(e)))
+    exit(1)
 
 # init Window & GUI
 WIN_NAME = "PACE Face"
@@ -86,9 +90,12 @@ cv2.setMouseCallback(WIN_NAME, gui.mouse_update)
 
 
 # initialize the video stream, then allow the camera sensor to warm up
-print("[INFO] starting video stream from WebCam #0...")
-vs = VideoStream(src=0).start()
-time.sleep(1.0)
+print("[INFO] starting video stream from {}...".format(args['source']))
+try:
+    vs = fs.open_source(args['source'], warmup=1.0).start()
+except fs.FrameSourceError as e:
+    print("ERROR. {}. Exit.".format(str(e)))
+    exit(1)
 print(" done. Start WebCam-Stream")
 
 # loop over frames from the video file stream
@@ -98,25 +105,21 @@ while True:
 
     # grab the frame, resize it (keep aspect-ratio) and get the image dimensions
     frame = vs.read()
+    if frame is None:   # end of file / recording
+        break
     frame = imutils.resize(frame, width=600)
     (h, w) = frame.shape[:2]
 
-    # construct a blob from the image and pass it to the OpenCV DNN to detect faces
-    imageBlob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0), swapRB=False, crop=False)
-    detector.setInput(imageBlob)
-    detections = detector.forward()
+    # detect faces (weak detections are filtered out by the detector)
+    detections = detector.detect(frame)
 
     # collect all detected faces
     faces = []
-    for i in range(0, detections.shape[2]):
-        # extract the confidence (i.e., probability) associated with the prediction
-        confidence = detections[0, 0, i, 2]
-        # filter out weak detections
-        if confidence > config['dnn_min_confidence']:       
-            # extraxt bbox
-            box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-            (startX, startY, endX, endY) = box.astype("int")
-            faces.append( [startX, startY, endX, endY] )
+    for detection in detections:
+        # extraxt bbox
+        box = detection[1:5] * np.array([w, h, w, h])
+        (startX, startY, endX, endY) = box.astype("int")
+        faces.append( [startX, startY, endX, endY] )
 
     # check, how many faces are visible/detected 
     if len(faces) < 1:
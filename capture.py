@@ -0,0 +1,70 @@
+# Capture-daemon: reads the camera once and publishes every frame on a shared-memory frame-bus.
+# Consumers attach with '--source bus:<name>', i.e.
+#   $ python3 capture.py &
+#   $ python3 recognize_video.py --source bus:facedetect
+#   $ python3 add-person.py -n john -f "john doe" -d data/traindata/john --source bus:facedetect
+
+# import the necessary packages
+import argparse
+import signal
+import time
+
+import utils.framesource as fs
+import utils.framebus as fb
+
+
+# read args
+ap = argparse.ArgumentParser()
+ap.add_argument("-s", "--source", default="0", help="frame-source: WebCam number, file:<path>, dir:<path>, synthetic[:WxH], replay:<path>, bus:<name> (see utils/framesource.py)")
+ap.add_argument("-n", "--name", default="facedetect", help="name of the frame-bus (shared memory)")
+ap.add_argument("--slots", type=int, default=8, help="number of frames in the ring-buffer")
+args = vars(ap.parse_args())
+
+# stop cleanly on ctrl-c and kill: the shared memory must be unlinked
+running = True
+def stop(signum, frame):
+    global running
+    running = False
+signal.signal(signal.SIGINT, stop)
+signal.signal(signal.SIGTERM, stop)
+
+# initialize the video stream (a WebCam waits 2s to let the camera sensor warm up)
+print("[INFO] starting video stream from {}...".format(args['source']))
+try:
+    vs = fs.open_source(args['source'], warmup=2.0).start()
+except fs.FrameSourceError as e:
+    print("ERROR. {}. Exit.".format(str(e)))
+    exit(1)
+
+bus = None
+last = None
+cnt = 0
+# the shared memory must be released on every exit, also on an error (the next start would fail otherwise)
+try:
+    while running:
+        frame = vs.read()
+        if frame is None:   # end of file / recording
+            break
+        # VideoStream.read() returns the last grabbed frame again, until the camera delivers the next one
+        if frame is last:
+            time.sleep(0.001)
+            continue
+        last = frame
+
+        # the very 1st frame: create the bus with its size
+        if bus is None:
+            try:
+                bus = fb.FrameBusWriter(args['name'], frame.shape, args['slots'])
+            except FileExistsError:
+                print("ERROR. frame-bus '{}' exists. Is another capture.py running? Exit.".format(args['name']))
+                break
+            print("[INFO] publishing {}x{} frames on frame-bus '{}'".format(frame.shape[1], frame.shape[0], args['name']))
+        bus.write(frame)
+        cnt += 1
+finally:
+    # exit: do a bit of cleanup
+    if bus is not None:
+        bus.close()
+    vs.stop()
+
+print("[INFO] {} frames published. Exit.".format(cnt))
@@ -0,0 +1,70 @@
+# Compare the face-detector backends (speed & recall) on the training-data of all persons in config.json.
+# Every training-image shows exactly one face: recall = images with a face found, 'multi' = images with more than one.
+
+# import the necessary packages
+import argparse
+import json
+import time
+
+import numpy as np
+import cv2
+import imutils
+
+import utils.detectors as dt
+import utils.evaluation as ev
+
+
+# read config-file
+config = None
+try:
+    fn = "config.json"
+    with open(fn, 'r') as json_file:
+        config = json.load(json_file)
+except Exception as e:
+    print("ERROR. Cant load config. Exit.")
+    exit(1)
+
+# read args
+ap = argparse.ArgumentParser()
+ap.add_argument("-b", "--backends", nargs="+", default=list(dt.BACKENDS), choices=dt.BACKENDS, help="detector backends to compare")
+args = vars(ap.parse_args())
+
+# load all images once, resized like train.py does
+images = []
+for (_, fn) in ev.list_images(config['persons']):
+    image = cv2.imread(fn)
+    if image is None:
+        print("[WARN] cant read image: {}".format(fn))
+        continue
+    images.append(imutils.resize(image, width=600))
+if not images:
+    print("ERROR. No training-images found for the persons in config.json. Exit.")
+    exit(1)
+print("[INFO] comparing {} detector backends on {} images".format(len(args['backends']), len(images)))
+
+rows = []
+for backend in args['backends']:
+    try:
+        detector = dt.create_detector(config, backend)
+    except dt.DetectorError as e:
+        print("[WARN] skipping backend '{}': {}".format(backend, str(e)))
+        continue
+
+    # warm-up: the 1st call allocates buffers
+    detector.detect(images[0])
+    found = 0
+    multi = 0
+    times = []
+    for image in images:
+        t0 = time.perf_counter()
+        detections = detector.detect(image)
+        times.append(time.perf_counter() - t0)
+        found += 1 if len(detections) > 0 else 0
+        multi += 1 if len(detections) > 1 else 0
+    rows.append((backend, found / len(images), multi, np.mean(times) * 1000, np.percentile(times, 95) * 1000))
+
+
+# print the comparison table, fastest first
+print("\n{:<8} {:>7} {:>6} {:>9} {:>9}".format("backend", "recall", "multi", "ms/frame", "p95 ms"))
+for (backend, recall, multi, ms, p95) in sorted(rows, key=lambda r: r[3]):
+    print("{:<8} {:>7.3f} {:>6} {:>9.2f} {:>9.2f}".format(backend, recall, multi, ms, p95))
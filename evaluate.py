@@ -0,0 +1,136 @@
+# Compare recognizer configurations: accuracy (cross-validation on the training-data) vs. cost (latency per face)
+
+# import the necessary packages
+import argparse
+import csv
+import json
+import itertools
+
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+
+import utils.detectors as dt
+import utils.evaluation as ev
+
+
+# read config-file
+config = None
+try:
+    fn = "config.json"
+    with open(fn, 'r') as json_file:
+        config = json.load(json_file)
+except Exception as e:
+    print("ERROR. Cant load config. Exit.")
+    exit(1)
+
+# read args
+ap = argparse.ArgumentParser()
+ap.add_argument("-s", "--sizes", type=int, nargs="+", default=[300], help="detector input sizes (pixels) to compare, ssd backend only. i.e. 150 200 300")
+ap.add_argument("-c", "--confidences", type=float, nargs="+", default=[config['dnn_min_confidence']], help="detector min. confidences to compare. i.e. 0.3 0.5 0.7")
+ap.add_argument("-b", "--backend", default=config.get('detector', {}).get('backend', 'ssd'), choices=dt.BACKENDS, help="face-detector backend (default: from config)")
+ap.add_argument("-r", "--recognizers", nargs="+", default=["svc"], choices=sorted(ev.RECOGNIZERS.keys()), help="recognizer types to compare")
+ap.add_argument("-m", "--mode", default="image", choices=["image", "person"], help="cross-validation: 'image' (k-fold over all images) or 'person' (each person held out once as unknown)")
+ap.add_argument("-k", "--folds", type=int, default=5, help="number of cross-validation folds")
+ap.add_argument("-u", "--unknown", type=float, default=0.5, help="min. probability to accept a recognition, below: 'unknown'")
+ap.add_argument("-j", "--jobs", type=int, default=-1, help="number of parallel worker processes. -1: all cores")
+ap.add_argument("-t", "--timing", type=int, default=20, help="number of images for the single-process timing pass")
+ap.add_argument("-o", "--out", default="evaluation.csv", help="file for the comparison table (csv)")
+args = vars(ap.parse_args())
+
+
+# all workers create the detector from the config (see utils/detectors.py)
+config['detector'] = dict(config.get('detector', {}), backend=args['backend'])
+try:
+    dt.create_detector(config)
+except dt.DetectorError as e:
+    print("ERROR. {}. Exit.".format(str(e)))
+    exit(1)
+if args['backend'] != "ssd":
+    args['sizes'] = args['sizes'][:1]
+
+images = ev.list_images(config['persons'])
+persons = sorted(set(n for (n, _) in images))
+print("[INFO] evaluating {} images of {} persons".format(len(images), len(persons)))
+
+parallel = Parallel(n_jobs=args['jobs'])
+# split the images in one chunk per job (each worker loads the dnns only once)
+n_chunks = max(1, min(len(images), effective_n_jobs(args['jobs']) * 4))
+chunks = [images[i::n_chunks] for i in range(n_chunks)]
+
+rows = []
+for (size, confidence) in itertools.product(args['sizes'], args['confidences']):
+    # PART 1: detect & embed all images with this detector setting
+    print(f"[INFO] extracting embeddings: detector '{args['backend']}' {size}x{size}, min. confidence {confidence}")
+    extracted = [r for chunk in parallel(delayed(ev.extract)(config, c, size, confidence) for c in chunks) for r in chunk]
+    faces = [(n, v, td, te) for (n, v, td, te) in extracted if v is not None]
+    print(" done. {}/{} faces found".format(len(faces), len(extracted)))
+    if not faces:
+        continue
+
+    # timing pass: in this process with all OpenCV threads, like the live loop (the workers above run single-threaded)
+    sample = images[::max(1, len(images) // args['timing'])][:args['timing']]
+    print(f"[INFO] timing detector & embedder on {len(sample)} images (single process)")
+    # warm-up: the 1st forward() allocates buffers
+    ev.extract(config, sample[:1], size, confidence, single_thread=False)
+    timed = ev.extract(config, sample, size, confidence, single_thread=False)
+    timed_faces = [te for (_, v, _, te) in timed if v is not None]
+    t_det = np.mean([td for (_, _, td, _) in timed])
+    t_emb = np.mean(timed_faces) if timed_faces else 0.0
+
+    names = [n for (n, _, _, _) in faces]
+    vecs = np.array([v for (_, v, _, _) in faces])
+    try:
+        folds = ev.make_folds(names, args['mode'], args['folds'])
+    except ev.EvaluationError as e:
+        print("ERROR. {}. Exit.".format(str(e)))
+        exit(1)
+
+    # PART 2: cross-validate every recognizer type, all folds in parallel
+    for rtype in args['recognizers']:
+        print(f"[INFO] cross-validating recognizer '{rtype}' ({len(folds)} folds)")
+        results = parallel(delayed(ev.run_fold)(rtype, vecs, names, f, args['unknown']) for f in folds)
+        y_true = [y for (t, _) in results for y in t]
+        y_pred = [y for (_, p) in results for y in p]
+        t_cls = ev.time_classify(rtype, vecs, names)
+        scores = ev.score(persons, y_true, y_pred)
+
+        for p in persons:
+            print("  {:<20} precision {:.3f}  recall {:.3f}".format(p, scores['precision'][p], scores['recall'][p]))
+        if scores['unknown_rejection'] is not None:
+            print("  {:<20} rejected  {:.3f}".format(ev.UNKNOWN, scores['unknown_rejection']))
+
+        row = {
+            'backend': args['backend'],
+            'size': size,
+            'confidence': confidence,
+            'recognizer': rtype,
+            'faces': "{}/{}".format(len(faces), len(extracted)),
+            'precision': np.mean(list(scores['precision'].values())),
+            'recall': np.mean(list(scores['recall'].values())),
+            'unknown_rejection': scores['unknown_rejection'],
+            'ms_detect': t_det * 1000,
+            'ms_embed': t_emb * 1000,
+            'ms_classify': t_cls * 1000,
+            'ms_total': (t_det + t_emb + t_cls) * 1000,
+        }
+        for p in persons:
+            row['precision_' + p] = scores['precision'][p]
+            row['recall_' + p] = scores['recall'][p]
+        rows.append(row)
+
+
+# print & write the comparison table, fastest first
+rows.sort(key=lambda r: r['ms_total'])
+print("\n{:>5} {:>5} {:<8} {:>9} {:>6} {:>6} {:>7} {:>8}".format("size", "conf", "recog", "faces", "prec", "recall", "unknown", "ms/face"))
+for r in rows:
+    unknown = "{:.3f}".format(r['unknown_rejection']) if r['unknown_rejection'] is not None else "n/a"
+    print("{:>5} {:>5} {:<8} {:>9} {:>6.3f} {:>6.3f} {:>7} {:>8.2f}".format(r['size'], r['confidence'], r['recognizer'], r['faces'], r['precision'], r['recall'], unknown, r['ms_total']))
+
+if not rows:
+    print("ERROR. No faces found with any detector setting. Exit.")
+    exit(1)
+with open(args['out'], 'w', newline='') as f:
+    writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+    writer.writeheader()
+    writer.writerows(rows)
+print("\n[INFO] comparison table written: {}".format(args['out']))
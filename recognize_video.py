@@ -1,16 +1,19 @@
 # Part 3: https://www.pyimagesearch.com/2018/09/24/opencv-face-recognition/
 
 # import the necessary packages
-from imutils.video import VideoStream
 from imutils.video import FPS
 import numpy as np
 import argparse
 import imutils
-import pickle
 import time
 import cv2
 import os
 import json
+import utils.modelwatch as mw
+import utils.motiongate as mg
+import utils.detectors as dt
+import utils.sightings as st
+import utils.framesource as fs
 
 # $ python recognize_video.py --detector face_detection_model \
 # 	--embedding-model openface_nn4.small2.v1.t7 \
@@ -36,58 +39,103 @@ except Exception as e:
     print("ERROR. Cant load config. Exit.")
     exit(1)
 
+# read args
+ap = argparse.ArgumentParser()
+ap.add_argument("-s", "--source", default="0", help="frame-source: WebCam number, file:<path>, dir:<path>, synthetic[:WxH], replay:<path>, bus:<name> (see utils/framesource.py)")
+ap.add_argument("-r", "--record", help="record the raw frames into this ring-file (replay with --source replay:<file>)")
+ap.add_argument("--record-frames", type=int, default=1000, help="capacity of the ring-file in frames")
+ap.add_argument("--max-frames", type=int, help="stop after N frames (profiling)")
+ap.add_argument("--headless", action="store_true", help="don't open a window (profiling / no display)")
+args = vars(ap.parse_args())
 
-# load our serialized face detector from disk
+# load the face detector backend from config (default: serialized SSD dnn from disk)
 print("[INFO] loading face detector...")
-protoPath = config['dnnpath'] + "/deploy.prototxt"
-modelPath = config['dnnpath'] +	"/res10_300x300_ssd_iter_140000.caffemodel"
-detector = cv2.dnn.readNetFromCaffe(protoPath, modelPath)
+try:
+    detector = dt.create_detector(config)
+except dt.DetectorError as e:
+    print("ERROR. {}. Exit.".format(str(e)))
+    exit(1)
 
 # load our serialized face embedding model from disk
 print("[INFO] loading face recognizer...")
 embedderPath = config['dnnpath'] + "/openface_nn4.small2.v1.t7"
 embedder = cv2.dnn.readNetFromTorch(embedderPath)
 
-# load the actual face recognition model along with the label encoder
+# load the actual face recognition model along with the label encoder. the watcher reloads both
+# in the background, when train.py writes a new version
 recognizerfn = config['dnnpath'] + "/recognizer.pickle"
-recognizer = pickle.loads(open(recognizerfn, "rb").read())
 labelencoderfn = config['dnnpath'] + "/labelencoder.pickle"
-labelencoder = pickle.loads(open(labelencoderfn, "rb").read())
+modelwatcher = mw.ModelWatcher(recognizerfn, labelencoderfn).start()
 
 
 
-# initialize the video stream, then allow the camera sensor to warm up
-print("[INFO] starting video stream from WebCam #0...")
-vs = VideoStream(src=0).start()
-time.sleep(2.0)
+# initialize the video stream (a WebCam waits 2s to let the camera sensor warm up)
+print("[INFO] starting video stream from {}...".format(args['source']))
+try:
+    vs = fs.open_source(args['source'], warmup=2.0).start()
+except fs.FrameSourceError as e:
+    print("ERROR. {}. Exit.".format(str(e)))
+    exit(1)
+recorder = fs.Recorder(args['record'], args['record_frames']) if args['record'] else None
 # start the FPS throughput estimator
 fps = FPS().start()
 
 
+# motion-gate: skip detection + recognition on static scenes (see config 'motion_gate')
+gatecfg = config.get('motion_gate', {})
+gate = None
+if gatecfg.get('enabled', True):
+    gate = mg.MotionGate(width=gatecfg.get('width', 160), threshold=gatecfg.get('threshold', 25),
+                         min_area=gatecfg.get('min_area', 0.002), max_interval=gatecfg.get('max_interval', 2.0),
+                         hold_time=gatecfg.get('hold_time', 1.0))
+# ms to wait for a key while the gate is closed. throttles the idle loop
+idle_wait = gatecfg.get('idle_wait', 50)
+
+# sighting event-log: who was seen when (see config 'sightings')
+sightcfg = config.get('sightings', {})
+sightings = None
+if sightcfg.get('enabled', False):
+    sightings = st.SightingLog(sightcfg.get('database', 'data/sightings.sqlite'), sightcfg.get('camera', 'cam0'),
+                               max_gap=sightcfg.get('max_gap', 5.0), flush_interval=sightcfg.get('flush_interval', 5.0),
+                               buffer_size=sightcfg.get('buffer_size', 1000)).start()
+
+# the recognized faces of the last detection run: list of (startX, startY, endX, endY, text)
+results = []
+nframes = 0
+
 # loop over frames from the video file stream
 while True:
     # grab the frame, resize it (keep aspect-ratio) and get the image dimensions
-    frame = vs.read()
-    frame = imutils.resize(frame, width=600)
+    fullframe = vs.read()
+    if fullframe is None:
+        # end of file / recording
+        break
+    if recorder is not None:
+        recorder.write(fullframe, vs.timestamp)
+    frame = imutils.resize(fullframe, width=600)
     (h, w) = frame.shape[:2]
 
-    # construct a blob from the image
-    imageBlob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0), swapRB=False, crop=False)
-    # apply OpenCV's deep learning-based face detector to localize faces in the input image
-    detector.setInput(imageBlob)
-    detections = detector.forward()
-
-    # loop over the detections
-    for i in range(0, detections.shape[2]):
-        # extract the confidence (i.e., probability) associated with the prediction
-        confidence = detections[0, 0, i, 2]
-        # filter out weak detections
-        if confidence > config['dnn_min_confidence']:
+    # nothing changed: keep the last results and go idle
+    active = gate is None or gate.check(frame, vs.timestamp)
+    if active:
+        # get the current recognizer (may have been swapped by the watcher since the last frame)
+        (recognizer, labelencoder) = modelwatcher.get()
+
+        # apply the face detector to localize faces in the frame. the tiled SSD works on the full-resolution
+        # frame; tiles only where the motion-gate saw changes
+        source = fullframe if detector.tiled else frame
+        detections = detector.detect(source, rois=gate.regions() if gate is not None and detector.tiled else None)
+        (sh, sw) = source.shape[:2]
+
+        # loop over the detections: [confidence, x0, y0, x1, y1] (normalized)
+        found = []
+        seen = []
+        for detection in detections:
             # compute the (x, y)-coordinates of the bounding box for the face
-            box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
+            box = detection[1:5] * np.array([sw, sh, sw, sh])
             (startX, startY, endX, endY) = box.astype("int")
             # extract the face ROI
-            face = frame[startY:endY, startX:endX]
+            face = source[startY:endY, startX:endX]
             (fH, fW) = face.shape[:2]
             # ensure the face width and height are sufficiently large
             if fW < 20 or fH < 20:
@@ -103,18 +151,40 @@ while True:
             j = np.argmax(preds)
             proba = preds[j]
             nickname = labelencoder.classes_[j]
-            
-            # draw the bounding box of the face along with the associated probability
+            seen.append((nickname, float(proba)))
+
             text = "{}: {:.2f}%".format(nickname, proba * 100)
-            y = startY - 10 if startY - 10 > 10 else startY + 10
-            cv2.rectangle(frame, (startX, startY), (endX, endY), (0, 0, 255), 2)
-            cv2.putText(frame, text, (startX, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 255), 2)
-    
+            (startX, startY, endX, endY) = (detection[1:5] * np.array([w, h, w, h])).astype("int")
+            found.append((startX, startY, endX, endY, text))
+
+        # a frame-bus view may have been overwritten by the producer meanwhile (slow reader): boxes and
+        # face-crops would come from different frames. drop this run and keep the last results
+        if vs.valid():
+            results = found
+            if sightings is not None:
+                for (nickname, proba) in seen:
+                    if proba >= sightcfg.get('min_confidence', 0.5):
+                        sightings.record(nickname, proba, vs.timestamp)
+
+    # draw the bounding box of the faces along with the associated probability
+    for (startX, startY, endX, endY, text) in results:
+        y = startY - 10 if startY - 10 > 10 else startY + 10
+        cv2.rectangle(frame, (startX, startY), (endX, endY), (0, 0, 255), 2)
+        cv2.putText(frame, text, (startX, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 255), 2)
+
     # update the FPS counter
     fps.update()
+    nframes += 1
+    if args['max_frames'] is not None and nframes >= args['max_frames']:
+        break
+    if args['headless']:
+        # only throttle a camera; a file or recording runs at its own (or max) speed
+        if not active and vs.live:
+            time.sleep(idle_wait / 1000.0)
+        continue
     # show the output frame
     cv2.imshow("Frame", frame)
-    key = cv2.waitKey(1) & 0xFF
+    key = cv2.waitKey(1 if active else idle_wait) & 0xFF
     # if the `q` key was pressed, break from the loop
     if key == ord("q"):
         break
@@ -126,6 +196,12 @@ print("[INFO] elasped time: {:.2f}".format(fps.elapsed()))
 print("[INFO] approx. FPS: {:.2f}".format(fps.fps()))
 
 # do a bit of cleanup
+modelwatcher.stop()
+if sightings is not None:
+    sightings.stop()
+if recorder is not None:
+    recorder.stop()
 vs.stop()
-time.sleep(1.0)	# is needed?! core-dump otherwise on cv2.destroyAllWindows()
-cv2.destroyAllWindows()
\ No newline at end of file
+if not args['headless']:
+    time.sleep(1.0)	# is needed?! core-dump otherwise on cv2.destroyAllWindows()
+    cv2.destroyAllWindows()
\ No newline at end of file
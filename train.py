@@ -1,14 +1,19 @@
 # Part 1 and 2 together: See https://www.pyimagesearch.com/2018/09/24/opencv-face-recognition/
 
 # import the necessary packages
+import argparse
 import pickle
 import json
 import glob
+import os
 
 import numpy as np
 import cv2
 
 import imutils
+import utils.modelwatch as mw
+import utils.detectors as dt
+import utils.incremental as inc
 from imutils import paths
 from sklearn.preprocessing import LabelEncoder
 from sklearn.svm import SVC
@@ -24,17 +29,46 @@ except Exception as e:
     print("ERROR. Cant load config. Exit.")
     exit(1)
 
+# read args
+ap = argparse.ArgumentParser()
+ap.add_argument("--full", action="store_true", help="recognizer type 'incremental': embed all images again and retrain from scratch")
+args = vars(ap.parse_args())
+
+# recognizer type: 'svc' (retrained on all images) or 'incremental' (learns only the new images)
+reccfg = config.get('recognizer', {})
+incremental = reccfg.get('type', 'svc') == 'incremental'
+datafn = config['dnnpath'] + "/embeddings.pickle"
+recognizerfn = config['dnnpath'] + "/recognizer.pickle"
+labelencoderfn = config['dnnpath'] + "/labelencoder.pickle"
+
+def file_stamp(fn:str) -> tuple:
+    """
+    Returns the Tuple (mtime, size) of an image-file: an image replaced under the same name gets a new stamp
+    """
+    st = os.stat(fn)
+    return (st.st_mtime_ns, st.st_size)
+
+# incremental: reuse the embeddings of all images already known (image-path -> (name, embedding, stamp))
+cached = {}
+if incremental and not args['full'] and os.path.exists(datafn):
+    with open(datafn, "rb") as f:
+        olddata = pickle.loads(f.read())
+    # embeddings written before there were paths and stamps can't be matched to images
+    for (path, stamp, name, vec) in zip(olddata.get("paths", []), olddata.get("stamps", []), olddata["names"], olddata["embeddings"]):
+        cached[path] = (name, vec, stamp)
 
 
 #################################################################
 ######## PART 1 : extract embeddings
 #################################################################
 
-# load our serialized face detector from disk
+# load the face detector backend from config (default: serialized SSD dnn from disk)
 print("[INFO] loading face detector dnn ...")
-protoPath = config['dnnpath'] + "/deploy.prototxt"
-modelPath = config['dnnpath'] +	"/res10_300x300_ssd_iter_140000.caffemodel"
-detector = cv2.dnn.readNetFromCaffe(protoPath, modelPath)
+try:
+    detector = dt.create_detector(config)
+except dt.DetectorError as e:
+    print("ERROR. {}. Exit.".format(str(e)))
+    exit(1)
 
 # load our serialized face embedding model from disk
 print("[INFO] loading face recognizer dnn ...")
@@ -48,6 +82,11 @@ print("[INFO] quantifying faces:")
 # initialize our lists of extracted facial embeddings and corresponding people names
 knownEmbeddings = []
 knownNames = []
+knownPaths = []
+knownStamps = []
+# the embeddings which are not in the cache (incremental: the only ones the recognizer has to learn)
+newEmbeddings = []
+newNames = []
 # initialize the total number of faces processed
 total = 0
 
@@ -63,51 +102,56 @@ for p in config['persons']:
 
     print(f"[INFO] generating embedding-vectors for person '{nickname}' ({fullname})")	
     for image_fn in trainimages:
+        stamp = file_stamp(image_fn)
+        # already embedded (and learned) for this person and the file is unchanged: reuse
+        if image_fn in cached and cached[image_fn][0] == nickname and cached[image_fn][2] == stamp:
+            knownNames.append(nickname)
+            knownEmbeddings.append(cached[image_fn][1])
+            knownPaths.append(image_fn)
+            knownStamps.append(stamp)
+            imgcnt += 1
+            total += 1
+            continue
+
         print(" image {}/{}: {}".format(imgcnt + 1,	len(trainimages), image_fn))
         # load the image, resize it to have a width of 600 pixels (while maintaining the aspect ratio), and then grab the image dimensions
         image = cv2.imread(image_fn)
         image = imutils.resize(image, width=600)
         (h, w) = image.shape[:2]
         
-        # construct a blob from the image
-        imageBlob = cv2.dnn.blobFromImage(
-            cv2.resize(image, (300, 300)), 1.0, (300, 300),
-            (104.0, 177.0, 123.0), swapRB=False, crop=False)
-        # apply OpenCV's deep learning-based face detector to localize faces in the input image
-        detector.setInput(imageBlob)
-        detections = detector.forward()
+        # apply the face detector to localize faces in the input image (best confidence first, weak detections are filtered out)
+        detections = detector.detect(image)
 
         # ensure at least one face was found
         if len(detections) > 0:
-            # we're making the assumption that each image has only ONE face, so find the bounding box with the largest probability
-            i = np.argmax(detections[0, 0, :, 2])
-            confidence = detections[0, 0, i, 2]
-            # ensure that the detection with the largest probability also means our minimum probability test (thus helping filter out weak detections)
-            if confidence > config['dnn_min_confidence']:
-                # compute the (x, y)-coordinates of the bounding box for the face
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (startX, startY, endX, endY) = box.astype("int")
-                # extract the face ROI and grab the ROI dimensions
-                face = image[startY:endY, startX:endX]
-                (fH, fW) = face.shape[:2]
-                # ensure the face width and height are sufficiently large
-                if fW < 20 or fH < 20:
-                    continue
-                # construct a blob for the face ROI, then pass the blob through our face embedding model to obtain the 128-d quantification of the face
-                faceBlob = cv2.dnn.blobFromImage(face, 1.0 / 255, (96, 96), (0, 0, 0), swapRB=True, crop=False)
-                embedder.setInput(faceBlob)
-                vec = embedder.forward()
-                # add the name of the person + corresponding face embedding to their respective lists
-                knownNames.append(nickname)
-                knownEmbeddings.append(vec.flatten())
-
-                imgcnt += 1
-                total += 1
+            # we're making the assumption that each image has only ONE face, so take the bounding box with the largest probability
+            # compute the (x, y)-coordinates of the bounding box for the face
+            box = detections[0, 1:5] * np.array([w, h, w, h])
+            (startX, startY, endX, endY) = box.astype("int")
+            # extract the face ROI and grab the ROI dimensions
+            face = image[startY:endY, startX:endX]
+            (fH, fW) = face.shape[:2]
+            # ensure the face width and height are sufficiently large
+            if fW < 20 or fH < 20:
+                continue
+            # construct a blob for the face ROI, then pass the blob through our face embedding model to obtain the 128-d quantification of the face
+            faceBlob = cv2.dnn.blobFromImage(face, 1.0 / 255, (96, 96), (0, 0, 0), swapRB=True, crop=False)
+            embedder.setInput(faceBlob)
+            vec = embedder.forward()
+            # add the name of the person + corresponding face embedding to their respective lists
+            knownNames.append(nickname)
+            knownEmbeddings.append(vec.flatten())
+            knownPaths.append(image_fn)
+            knownStamps.append(stamp)
+            newNames.append(nickname)
+            newEmbeddings.append(vec.flatten())
+
+            imgcnt += 1
+            total += 1
 
 # dump the facial embeddings + names to disk
 print("[INFO] serializing the {} generated embedding-vectors for {} persons...".format(total, len(config['persons'])))
-data = {"embeddings": knownEmbeddings, "names": knownNames}
-datafn = config['dnnpath'] + "/embeddings.pickle"
+data = {"embeddings": knownEmbeddings, "names": knownNames, "paths": knownPaths, "stamps": knownStamps}
 f = open(datafn, "wb")
 f.write(pickle.dumps(data))
 print (" done. {} written.".format(datafn))
@@ -133,25 +177,43 @@ print(" done.")
 
 # train the model used to accept the 128-d embeddings of the face and
 # then produce the actual face recognition
-print("[INFO] training recognizer SVM-model...")
-recognizer = SVC(C=1.0, kernel="linear", probability=True)
-recognizer.fit(data["embeddings"], labels)
+if incremental:
+    # fold the new images into the existing model. retrain from scratch, if there is no incremental model yet,
+    # images/persons were removed or changed (a mean can't forget) or after 'refit_every' updates
+    recognizer = None
+    if not args['full'] and os.path.exists(recognizerfn):
+        with open(recognizerfn, "rb") as f:
+            recognizer = pickle.loads(f.read())
+    removed = len(knownPaths) - len(newNames) < len(cached)
+    if (not isinstance(recognizer, inc.IncrementalRecognizer) or removed or
+            recognizer.updates_ >= reccfg.get('refit_every', 20)):
+        print("[INFO] training incremental recognizer from scratch ({} embedding-vectors)...".format(len(knownNames)))
+        recognizer = inc.IncrementalRecognizer().fit(data["embeddings"], data["names"])
+    elif newNames:
+        print("[INFO] updating incremental recognizer with {} new embedding-vectors...".format(len(newNames)))
+        recognizer.partial_fit(newEmbeddings, newNames)
+    else:
+        print("[INFO] no new images, recognizer unchanged.")
+    # calibration check: an unknown face must not be recognized with (near) certainty
+    unseen = recognizer.unseen_proba(data["embeddings"], data["names"])
+    if unseen is not None:
+        print(" probability scale {:.1f}, an unseen person gets {:.1f}% on average".format(recognizer.scale_, unseen * 100))
+        if unseen > 0.9:
+            print("[WARN] the recognizer is overconfident on unknown faces. Retrain with --full.")
+else:
+    print("[INFO] training recognizer SVM-model...")
+    recognizer = SVC(C=1.0, kernel="linear", probability=True)
+    recognizer.fit(data["embeddings"], labels)
 print(" done.")
 
 # write the actual face recognition model to disk
 print("[INFO] serializing recognizer...")
-recognizerfn = config['dnnpath'] + "/recognizer.pickle"
-f = open(recognizerfn, "wb")
-f.write(pickle.dumps(recognizer))
-f.close()
+mw.write_pickle_atomic(recognizer, recognizerfn)
 print (" done. {} written.".format(recognizerfn))
 
 # write the label encoder to disk
 print("[INFO] serializing labelencoder...")
-labelencoderfn = config['dnnpath'] + "/labelencoder.pickle"
-f = open(labelencoderfn, "wb")
-f.write(pickle.dumps(labelencoder))
-f.close()
+mw.write_pickle_atomic(labelencoder, labelencoderfn)
 print (" done. {} written.".format(labelencoderfn))
 
 print("[INFO] training finished.")
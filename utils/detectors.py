@@ -0,0 +1,159 @@
+##########################################
+####   Face-Detector Backends         ####
+##########################################
+import math
+
+import cv2
+import numpy
+
+import utils.tiling as tl
+
+
+class DetectorError (Exception):
+    pass
+
+
+class FaceDetector:
+    """
+    Base-class of all face-detector backends. detect() always returns the same format:
+    a numpy array (N, 5) of [confidence, x0, y0, x1, y1], coords normalized to the frame (0.0..1.0),
+    best confidence first. Only detections above min_confidence are returned.
+    """
+    name = "base"
+    # True: the backend can use the full-resolution frame (tiling), else pass the small (600px) frame
+    tiled = False
+
+    def __init__(self, min_confidence:float = 0.5) -> None:
+        self.min_confidence:float = min_confidence
+
+    def detect(self, frame, rois:list = None):
+        raise NotImplementedError()
+
+    @staticmethod
+    def _result(detections):
+        """
+        Returns the detections as float32-array (N, 5), best confidence first
+        """
+        detections = numpy.array(detections, dtype=numpy.float32).reshape(-1, 5)
+        return detections[numpy.argsort(-detections[:, 0])]
+
+    def _downscale(self, frame, width:int):
+        """
+        Returns the frame resized to 'width' pixels (keep aspect-ratio), if it is wider
+        """
+        (h, w) = frame.shape[:2]
+        if not width or w <= width:
+            return frame
+        return cv2.resize(frame, (width, int(h * width / w)), interpolation=cv2.INTER_AREA)
+
+
+class SsdDetector (FaceDetector):
+    """
+    OpenCV's DNN face detector: ResNet-10 SSD (Caffe), the default. Optional tiled mode for high-resolution
+    frames (see utils/tiling.py and config 'tiling').
+    """
+    name = "ssd"
+
+    def __init__(self, dnnpath:str, min_confidence:float = 0.5, size:int = tl.SSD_SIZE, tiling:dict = None) -> None:
+        super().__init__(min_confidence)
+        protoPath = dnnpath + "/deploy.prototxt"
+        modelPath = dnnpath + "/res10_300x300_ssd_iter_140000.caffemodel"
+        self.net = cv2.dnn.readNetFromCaffe(protoPath, modelPath)
+        self.size:int = size
+        self.tiling:dict = tiling or {}
+        self.tiled = self.tiling.get('enabled', False)
+
+    def detect(self, frame, rois:list = None):
+        if self.tiled:
+            return tl.detect(self.net, frame, self.min_confidence, tile=self.tiling.get('tile', tl.SSD_SIZE),
+                             overlap=self.tiling.get('overlap', 0.25), min_width=self.tiling.get('min_width', 1000),
+                             rois=rois if self.tiling.get('roi_only', True) else None, max_tiles=self.tiling.get('max_tiles', 16))
+
+        # construct a blob from the image and apply the detector to localize faces in the input image
+        imageBlob = cv2.dnn.blobFromImage(cv2.resize(frame, (self.size, self.size)), 1.0, (self.size, self.size), tl.SSD_MEAN, swapRB=False, crop=False)
+        self.net.setInput(imageBlob)
+        detections = self.net.forward()[0, 0, :, 2:7]
+        # filter out weak detections
+        return self._result(detections[detections[:, 0] > self.min_confidence])
+
+
+class HogDetector (FaceDetector):
+    """
+    dlib's HOG + linear SVM frontal face detector. No DNN, runs on every CPU; finds faces from ~80px on.
+    The SVM score is mapped to a confidence by a sigmoid: confidence 0.5 == score 0.0.
+    upsample: upsample the image N times to find smaller faces (slower)
+    width: detect on a frame downscaled to this width (faster)
+    """
+    name = "hog"
+
+    def __init__(self, min_confidence:float = 0.5, upsample:int = 0, width:int = 320) -> None:
+        super().__init__(min_confidence)
+        # imported here: dlib is only needed for this backend
+        try:
+            import dlib
+        except ImportError as e:
+            raise DetectorError("dlib not installed, needed for the 'hog' backend ({})".format(str(e)))
+        self.hog = dlib.get_frontal_face_detector()
+        self.upsample:int = upsample
+        self.width:int = width
+
+    def detect(self, frame, rois:list = None):
+        small = self._downscale(frame, self.width)
+        (h, w) = small.shape[:2]
+        rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        (rects, scores, _) = self.hog.run(rgb, self.upsample, -1.0)
+
+        detections = []
+        for (r, score) in zip(rects, scores):
+            confidence = 1.0 / (1.0 + math.exp(-score))
+            if confidence > self.min_confidence:
+                detections.append([confidence, max(0, r.left()) / w, max(0, r.top()) / h, min(w, r.right()) / w, min(h, r.bottom()) / h])
+        return self._result(detections)
+
+
+class CascadeDetector (FaceDetector):
+    """
+    OpenCV's Haar or LBP cascade classifier (Viola-Jones). The cheapest backend, for very weak CPUs.
+    A cascade has no score: every detection gets the confidence 1.0.
+    cascade: 'haar' (shipped with opencv-python) or the path of a cascade xml-file (i.e. lbpcascade_frontalface_improved.xml)
+    width: detect on a frame downscaled to this width (faster)
+    """
+    name = "cascade"
+
+    def __init__(self, cascade:str = "haar", width:int = 320, scale_factor:float = 1.1, min_neighbors:int = 5, min_size:int = 20) -> None:
+        super().__init__(0.0)
+        fn = cv2.data.haarcascades + "haarcascade_frontalface_default.xml" if cascade == "haar" else cascade
+        self.cascade = cv2.CascadeClassifier(fn)
+        if self.cascade.empty():
+            raise DetectorError("cant load cascade: {}".format(fn))
+        self.width:int = width
+        self.scale_factor:float = scale_factor
+        self.min_neighbors:int = min_neighbors
+        self.min_size:int = min_size
+
+    def detect(self, frame, rois:list = None):
+        small = self._downscale(frame, self.width)
+        (h, w) = small.shape[:2]
+        gray = cv2.equalizeHist(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+        rects = self.cascade.detectMultiScale(gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors, minSize=(self.min_size, self.min_size))
+        return self._result([[1.0, x / w, y / h, (x + rw) / w, (y + rh) / h] for (x, y, rw, rh) in rects])
+
+
+BACKENDS = ("ssd", "hog", "cascade")
+
+
+def create_detector(config:dict, backend:str = None) -> FaceDetector:
+    """
+    Returns the face-detector configured in config['detector'] (backend: ssd, hog or cascade).
+    backend: overrides the backend from the config.
+    Raises 'DetectorError' for unknown backends or a missing dependency (dlib).
+    """
+    cfg = config.get('detector', {})
+    backend = backend or cfg.get('backend', 'ssd')
+    if backend == "ssd":
+        return SsdDetector(config['dnnpath'], config['dnn_min_confidence'], size=cfg.get('size', tl.SSD_SIZE), tiling=config.get('tiling'))
+    if backend == "hog":
+        return HogDetector(config['dnn_min_confidence'], upsample=cfg.get('hog_upsample', 0), width=cfg.get('width', 320))
+    if backend == "cascade":
+        return CascadeDetector(cfg.get('cascade', 'haar'), width=cfg.get('width', 320), min_neighbors=cfg.get('cascade_min_neighbors', 5))
+    raise DetectorError("unknown detector backend '{}'. Must be one of {}.".format(backend, BACKENDS))
@@ -0,0 +1,186 @@
+##########################################
+####   Accuracy vs. Cost Evaluation   ####
+##########################################
+import glob
+import time
+
+import numpy
+import cv2
+import imutils
+from sklearn.model_selection import StratifiedKFold
+from sklearn.metrics import precision_recall_fscore_support
+from sklearn.svm import SVC
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.linear_model import LogisticRegression
+
+import utils.detectors as dt
+from utils.incremental import IncrementalRecognizer
+
+
+UNKNOWN = "unknown"
+
+# recognizer types to compare. 'svc' is the model train.py uses
+RECOGNIZERS = {
+    'svc':     lambda: SVC(C=1.0, kernel="linear", probability=True),
+    'svc-rbf': lambda: SVC(C=1.0, kernel="rbf", probability=True),
+    'logreg':  lambda: LogisticRegression(C=1.0, max_iter=1000),
+    'knn':     lambda: KNeighborsClassifier(n_neighbors=5, weights="distance"),
+    'incremental': lambda: IncrementalRecognizer(),
+}
+
+# dnns per worker process: (backend, size, min_confidence) -> (detector, embedder)
+_nets = {}
+
+
+class EvaluationError (Exception):
+    pass
+
+
+def list_images(persons:list) -> list:
+    """
+    Returns the list of (nickname, image_fn) for all training-images of all persons (same images as train.py)
+    """
+    images = []
+    for p in persons:
+        for fn in sorted(glob.glob(p['traindata'] + "/*.png") + glob.glob(p['traindata'] + "/*.jpg")):
+            images.append((p['nickname'], fn))
+    return images
+
+
+def _get_nets(config:dict, size:int, min_confidence:float) -> tuple:
+    """
+    Returns the Tuple (detector, embedder): the detector backend from config['detector'] (see utils/detectors.py)
+    with the input size 'size' (ssd only) and min_confidence. Loaded only once per worker process.
+    Raises 'DetectorError', if the backend cant be created.
+    """
+    cfg = config.get('detector', {})
+    key = (cfg.get('backend', 'ssd'), size, min_confidence)
+    if key not in _nets:
+        # the images are resized to 600px like in train.py: no tiling
+        detector = dt.create_detector(dict(config, dnn_min_confidence=min_confidence, tiling=None, detector=dict(cfg, size=size)))
+        embedder = cv2.dnn.readNetFromTorch(config['dnnpath'] + "/openface_nn4.small2.v1.t7")
+        _nets[key] = (detector, embedder)
+    return _nets[key]
+
+
+def extract(config:dict, images:list, size:int, min_confidence:float, single_thread:bool = True) -> list:
+    """
+    Detects the (best) face in every image and computes its embedding, exactly like train.py, with the configured
+    detector backend and the detector input size 'size' x 'size'. Runs in a worker process.
+    single_thread: one OpenCV thread per process, the parallelism comes from the worker processes. Use False
+    for the timing pass in the main process, so the times match the (multi-threaded) live loop.
+    Returns a list of (nickname, vec, det_seconds, emb_seconds); vec is None, if no usable face was found.
+    Unreadable images are skipped.
+    """
+    # (< 0: OpenCV's default number of threads)
+    cv2.setNumThreads(1 if single_thread else -1)
+    (detector, embedder) = _get_nets(config, size, min_confidence)
+    result = []
+    for (nickname, image_fn) in images:
+        image = cv2.imread(image_fn)
+        if image is None:
+            print("[WARN] cant read image: {}".format(image_fn))
+            continue
+        image = imutils.resize(image, width=600)
+        (h, w) = image.shape[:2]
+
+        t0 = time.perf_counter()
+        detections = detector.detect(image)
+        t_det = time.perf_counter() - t0
+
+        vec = None
+        t_emb = 0.0
+        # [confidence, x0, y0, x1, y1], best confidence first, already filtered by min_confidence
+        if len(detections) > 0:
+            box = detections[0, 1:5] * numpy.array([w, h, w, h])
+            (startX, startY, endX, endY) = box.astype("int")
+            face = image[startY:endY, startX:endX]
+            (fH, fW) = face.shape[:2]
+            if fW >= 20 and fH >= 20:
+                t0 = time.perf_counter()
+                faceBlob = cv2.dnn.blobFromImage(face, 1.0 / 255, (96, 96), (0, 0, 0), swapRB=True, crop=False)
+                embedder.setInput(faceBlob)
+                vec = embedder.forward().flatten()
+                t_emb = time.perf_counter() - t0
+        result.append((nickname, vec, t_det, t_emb))
+    return result
+
+
+def make_folds(names:list, mode:str, folds:int, seed:int = 42) -> list:
+    """
+    Returns the list of folds (train_names, train_idx, test_idx, unknown_idx) as index-arrays into names.
+     mode 'image': stratified k-fold over all images of all persons, no unknowns.
+     mode 'person': every person is held out once (its images are the unknowns), the remaining persons
+                    are split by a stratified k-fold. Needs at least 3 persons.
+    """
+    names = numpy.array(names)
+    persons = sorted(set(names))
+
+    if mode == 'image':
+        groups = [(persons, numpy.arange(len(names)), numpy.array([], dtype=int))]
+    elif mode == 'person':
+        if len(persons) < 3:
+            raise EvaluationError("person-disjoint evaluation needs at least 3 persons, found {}".format(len(persons)))
+        groups = []
+        for p in persons:
+            groups.append(([q for q in persons if q != p], numpy.where(names != p)[0], numpy.where(names == p)[0]))
+    else:
+        raise EvaluationError("unknown mode: {}".format(mode))
+
+    result = []
+    for (known, idx, unknown_idx) in groups:
+        # not more folds than the smallest person has images
+        k = min(folds, min(int((names[idx] == p).sum()) for p in known))
+        if k < 2:
+            raise EvaluationError("need at least 2 images per person for cross-validation")
+        skf = StratifiedKFold(n_splits=k, shuffle=True, random_state=seed)
+        for (train, test) in skf.split(idx, names[idx]):
+            result.append((known, idx[train], idx[test], unknown_idx))
+    return result
+
+
+def run_fold(recognizer_type:str, vecs, names, fold:tuple, threshold:float) -> tuple:
+    """
+    Trains one recognizer on the training part of the fold and predicts the test part and the unknowns.
+    Predictions with a probability below threshold count as 'unknown'. Runs in a worker process.
+    Returns the Tuple (y_true, y_pred)
+    """
+    (known, train, test, unknown_idx) = fold
+    names = numpy.array(names)
+    recognizer = RECOGNIZERS[recognizer_type]()
+    recognizer.fit(vecs[train], names[train])
+
+    test_idx = numpy.concatenate([test, unknown_idx]).astype(int)
+    y_true = [n if i < len(test) else UNKNOWN for (i, n) in enumerate(names[test_idx])]
+
+    preds = recognizer.predict_proba(vecs[test_idx])
+    j = numpy.argmax(preds, axis=1)
+    y_pred = [recognizer.classes_[k] if p[k] >= threshold else UNKNOWN for (p, k) in zip(preds, j)]
+
+    return (y_true, y_pred)
+
+
+def time_classify(recognizer_type:str, vecs, names, n:int = 100) -> float:
+    """
+    Trains the recognizer on all embeddings and returns the seconds per face for classifying up to n of them
+    one by one, like the live loop does. Runs in the main process (timing pass).
+    """
+    recognizer = RECOGNIZERS[recognizer_type]()
+    recognizer.fit(vecs, numpy.array(names))
+    sample = vecs[:n]
+    t0 = time.perf_counter()
+    for vec in sample:
+        recognizer.predict_proba(vec.reshape(1, -1))
+    return (time.perf_counter() - t0) / max(1, len(sample))
+
+
+def score(persons:list, y_true:list, y_pred:list) -> dict:
+    """
+    Returns per-identity precision/recall and the unknown-rejection rate (fraction of unknowns classified as 'unknown')
+    """
+    (prec, rec, _, _) = precision_recall_fscore_support(y_true, y_pred, labels=persons, zero_division=0)
+    result = {'precision': dict(zip(persons, prec)), 'recall': dict(zip(persons, rec))}
+
+    unknowns = [p for (t, p) in zip(y_true, y_pred) if t == UNKNOWN]
+    result['unknown_rejection'] = (sum(1 for p in unknowns if p == UNKNOWN) / len(unknowns)) if unknowns else None
+    return result
@@ -0,0 +1,182 @@
+##########################################
+####   Shared-Memory Frame-Bus        ####
+##########################################
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy
+
+from utils.framesource import FrameSource, FrameSourceError
+
+
+# layout: header (8 x int64) | slot-seqs (slots x int64) | timestamps (slots x float64) | frames (slots x h x w x c uint8)
+_MAGIC = 0x31535542444346        # "FDCBUS1"
+_HEADER = 8
+_H_SHAPE = slice(1, 4)
+_H_SLOTS = 4
+_H_LATEST = 5
+_H_CLOSED = 6
+
+
+def _map(buf, h:int, w:int, c:int, slots:int) -> tuple:
+    """
+    Returns the Tuple (header, seqs, timestamps, frames) as numpy views on the shared memory buffer
+    """
+    header = numpy.ndarray((_HEADER,), dtype=numpy.int64, buffer=buf)
+    offset = _HEADER * 8
+    seqs = numpy.ndarray((slots,), dtype=numpy.int64, buffer=buf, offset=offset)
+    offset += slots * 8
+    timestamps = numpy.ndarray((slots,), dtype=numpy.float64, buffer=buf, offset=offset)
+    offset += slots * 8
+    frames = numpy.ndarray((slots, h, w, c), dtype=numpy.uint8, buffer=buf, offset=offset)
+    return (header, seqs, timestamps, frames)
+
+
+class FrameBusWriter:
+    """
+    The producer side (one per bus): publishes frames into a ring of 'slots' frames in shared memory.
+    Every frame gets a sequence number; the producer never waits for any reader. A reader that is more than
+    'slots' frames behind simply misses frames.
+    """
+    def __init__(self, name:str, shape:tuple, slots:int = 8) -> None:
+        (h, w) = shape[:2]
+        c = shape[2] if len(shape) > 2 else 1
+        size = _HEADER * 8 + slots * 16 + slots * h * w * c
+        self.name:str = name
+        self.__shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        (self.__header, self.__seqs, self.__timestamps, self.__frames) = _map(self.__shm.buf, h, w, c, slots)
+        self.__seqs[:] = -1
+        self.__header[:] = (_MAGIC, h, w, c, slots, -1, 0, 0)
+        self.__seq:int = 0
+
+    def write(self, frame, timestamp:float = None) -> int:
+        """
+        Copies the frame into the next slot (the only copy on the bus). Returns its sequence number.
+        """
+        seq = self.__seq
+        slot = seq % len(self.__seqs)
+        # mark the slot as 'in progress' first, a reader validates against it
+        self.__seqs[slot] = -1
+        self.__frames[slot] = frame.reshape(self.__frames.shape[1:])
+        self.__timestamps[slot] = time.time() if timestamp is None else timestamp
+        self.__seqs[slot] = seq
+        self.__header[_H_LATEST] = seq
+        self.__seq += 1
+        return seq
+
+    def close(self) -> None:
+        """
+        Tells the readers that no more frames will come and removes the shared memory.
+        """
+        self.__header[_H_CLOSED] = 1
+        del self.__header, self.__seqs, self.__timestamps, self.__frames
+        self.__shm.unlink()
+        self.__shm.close()
+
+
+class FrameBusReader:
+    """
+    A consumer: attaches to an existing bus and reads the newest frame as numpy view into the shared memory
+    (no pickling, no copy). Any number of readers can attach.
+    A view stays valid until the producer wraps around the ring; check it with valid(seq) after using it, or
+    pass copy=True.
+    """
+    def __init__(self, name:str) -> None:
+        self.name:str = name
+        try:
+            self.__shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            raise FrameSourceError("frame-bus '{}' not found. Is capture.py running?".format(name))
+        # only the producer owns (and unlinks) the memory
+        resource_tracker.unregister(self.__shm._name, "shared_memory")
+
+        header = numpy.ndarray((_HEADER,), dtype=numpy.int64, buffer=self.__shm.buf)
+        if header[0] != _MAGIC:
+            raise FrameSourceError("not a frame-bus: {}".format(name))
+        (h, w, c) = (int(v) for v in header[_H_SHAPE])
+        (self.__header, self.__seqs, self.__timestamps, self.__frames) = _map(self.__shm.buf, h, w, c, int(header[_H_SLOTS]))
+        self.shape:tuple = (h, w, c)
+        self.last_seq:int = -1
+        self.skipped:int = 0
+
+    def closed(self) -> bool:
+        return bool(self.__header[_H_CLOSED])
+
+    def valid(self, seq:int) -> bool:
+        """
+        Returns True, if the slot of frame 'seq' was not overwritten in the meantime
+        """
+        return self.__seqs[seq % len(self.__seqs)] == seq
+
+    def read(self, timeout:float = 5.0, copy:bool = False) -> tuple:
+        """
+        Waits for a frame newer than the last one read and returns the Tuple (seq, timestamp, frame).
+        Always returns the newest frame: a slow reader skips ahead (counted in 'skipped').
+        Returns (None, None, None) on timeout or if the producer has closed the bus.
+        Without copy the frame is a view into the bus: check valid(seq) again after using it.
+        """
+        deadline = time.perf_counter() + timeout
+        while True:
+            seq = int(self.__header[_H_LATEST])
+            if seq > self.last_seq:
+                slot = seq % len(self.__seqs)
+                frame = self.__frames[slot]
+                timestamp = float(self.__timestamps[slot])
+                if copy:
+                    frame = frame.copy()
+                # the producer was faster than us and overwrote the slot: try again with the newest frame
+                if self.valid(seq):
+                    if self.last_seq >= 0:
+                        self.skipped += seq - self.last_seq - 1
+                    self.last_seq = seq
+                    return (seq, timestamp, frame)
+                continue
+            if self.closed() or time.perf_counter() > deadline:
+                return (None, None, None)
+            time.sleep(0.001)
+
+    def close(self) -> None:
+        del self.__header, self.__seqs, self.__timestamps, self.__frames
+        try:
+            self.__shm.close()
+        except BufferError:
+            # the caller still holds frame-views; the memory is released with the process
+            pass
+
+
+class BusSource (FrameSource):
+    """
+    FrameSource on top of a FrameBusReader: read() returns the newest frame as (read-only) view, None when
+    the producer has closed the bus. A camera stall does not end the stream: read() warns every 'timeout'
+    seconds and keeps waiting. The view is overwritten after 'slots' more frames: call valid() after using
+    the frame (or copy it) and drop the results of an overwritten frame.
+    """
+    live = True
+
+    def __init__(self, name:str, timeout:float = 5.0) -> None:
+        self.name:str = name
+        self.timeout:float = timeout
+        self.__reader = None
+        self.__seq = None
+
+    def start(self):
+        self.__reader = FrameBusReader(self.name)
+        return self
+
+    def read(self):
+        while True:
+            (self.__seq, self.timestamp, frame) = self.__reader.read(self.timeout)
+            if frame is not None:
+                frame.flags.writeable = False
+                return frame
+            if self.__reader.closed():
+                return None
+            print("[WARN] no frame on frame-bus '{}' for {:.0f}s, waiting...".format(self.name, self.timeout))
+
+    def valid(self) -> bool:
+        return self.__seq is not None and self.__reader.valid(self.__seq)
+
+    def stop(self) -> None:
+        if self.__reader is not None:
+            self.__reader.close()
+            self.__reader = None
@@ -0,0 +1,359 @@
+##########################################
+####   Frame-Sources & Ring-Recorder  ####
+##########################################
+import glob
+import os
+import time
+
+import cv2
+import numpy
+
+
+class FrameSourceError (Exception):
+    pass
+
+
+class FrameSource:
+    """
+    Base-class of all frame-sources. Same interface as imutils' VideoStream: start() / read() / stop().
+    read() returns the next BGR frame as numpy array, or None if the source is exhausted (files, recordings).
+    timestamp: seconds, time of the frame last read. For files, recordings and generated frames it comes from
+               the source (not from the clock), so a replay behaves the same on every run.
+    live: True for cameras; False for sources which can be played faster than realtime.
+    """
+    timestamp:float = None
+    live:bool = False
+
+    def start(self):
+        """
+        Opens the source. Returns self.
+        """
+        return self
+
+    def read(self):
+        raise NotImplementedError()
+
+    def valid(self) -> bool:
+        """
+        Returns True, if the frame last read is still intact. Only a zero-copy source (frame-bus) can overwrite
+        a frame while the consumer still works on it; check after using the frame and drop the results if False.
+        """
+        return True
+
+    def stop(self) -> None:
+        pass
+
+
+class WebcamSource (FrameSource):
+    """
+    A live WebCam (imutils VideoStream, threaded). warmup: seconds to let the camera sensor warm up.
+    """
+    live = True
+
+    def __init__(self, src:int = 0, warmup:float = 2.0) -> None:
+        self.src:int = src
+        self.warmup:float = warmup
+        self.__vs = None
+
+    def start(self):
+        # imported here: the other sources don't need imutils' camera threads
+        from imutils.video import VideoStream
+        self.__vs = VideoStream(src=self.src).start()
+        time.sleep(self.warmup)
+        return self
+
+    def read(self):
+        self.timestamp = time.time()
+        return self.__vs.read()
+
+    def stop(self) -> None:
+        if self.__vs is not None:
+            self.__vs.stop()
+
+
+class _PacedSource (FrameSource):
+    """
+    Helper for sources with a fixed frame-rate. fps=None (or 0): deliver frames as fast as possible.
+    """
+    def __init__(self, fps:float = None) -> None:
+        self.fps:float = fps
+        self.__next:float = 0.0
+
+    def _pace(self) -> None:
+        if not self.fps:
+            return
+        now = time.perf_counter()
+        if self.__next > now:
+            time.sleep(self.__next - now)
+        self.__next = max(now, self.__next) + 1.0 / self.fps
+
+
+class FileSource (_PacedSource):
+    """
+    A video-file (everything cv2.VideoCapture can open).
+    realtime: True: play at the frame-rate of the file, False: as fast as possible
+    """
+    def __init__(self, path:str, realtime:bool = False, loop:bool = False) -> None:
+        super().__init__()
+        self.path:str = path
+        self.realtime:bool = realtime
+        self.loop:bool = loop
+        self.__cap = None
+
+    def start(self):
+        self.__cap = cv2.VideoCapture(self.path)
+        if not self.__cap.isOpened():
+            raise FrameSourceError("cant open video-file: {}".format(self.path))
+        if self.realtime:
+            self.fps = self.__cap.get(cv2.CAP_PROP_FPS) or 25.0
+        return self
+
+    def read(self):
+        (ok, frame) = self.__cap.read()
+        if not ok and self.loop:
+            self.__cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            (ok, frame) = self.__cap.read()
+        self.timestamp = self.__cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        self._pace()
+        return frame if ok else None
+
+    def stop(self) -> None:
+        if self.__cap is not None:
+            self.__cap.release()
+
+
+class ImageDirSource (_PacedSource):
+    """
+    All images (*.png, *.jpg) of a directory, sorted by filename. All images are resized to the size of the first one.
+    Unreadable images are skipped.
+    """
+    def __init__(self, path:str, fps:float = None, loop:bool = False) -> None:
+        super().__init__(fps)
+        self.path:str = path
+        self.loop:bool = loop
+        self.__files = []
+        self.__pos:int = 0
+        self.__size = None
+
+    def start(self):
+        self.__files = sorted(glob.glob(self.path + "/*.png") + glob.glob(self.path + "/*.jpg"))
+        if not self.__files:
+            raise FrameSourceError("no images found in: {}".format(self.path))
+        return self
+
+    def read(self):
+        frame = None
+        while frame is None:
+            if self.__pos >= len(self.__files):
+                if not self.loop or not self.__files:
+                    return None
+                self.__pos = 0
+            frame = cv2.imread(self.__files[self.__pos])
+            if frame is None:
+                # unreadable: drop it, also for the next loop
+                print("[WARN] cant read image: {}".format(self.__files.pop(self.__pos)))
+        self.timestamp = self.__pos / (self.fps or 25.0)
+        self.__pos += 1
+        if self.__size is None:
+            self.__size = (frame.shape[1], frame.shape[0])
+        elif (frame.shape[1], frame.shape[0]) != self.__size:
+            frame = cv2.resize(frame, self.__size)
+        self._pace()
+        return frame
+
+
+class SyntheticSource (_PacedSource):
+    """
+    Deterministic generated frames: a noisy background with moving patches. If faces_dir is given, the images
+    from this directory (i.e. data/traindata/<person>) are pasted as moving patches, so the detector has work to do.
+    count: number of frames, None: endless. The same seed always produces the same frames.
+    """
+    def __init__(self, width:int = 640, height:int = 480, fps:float = None, count:int = None, faces_dir:str = None, seed:int = 0) -> None:
+        super().__init__(fps)
+        self.width:int = width
+        self.height:int = height
+        self.count:int = count
+        self.faces_dir:str = faces_dir
+        self.seed:int = seed
+        self.__n:int = 0
+        self.__rnd = None
+        self.__background = None
+        self.__patches = []
+
+    def start(self):
+        self.__rnd = numpy.random.RandomState(self.seed)
+        self.__background = self.__rnd.randint(0, 64, (self.height, self.width, 3), dtype=numpy.uint8)
+        size = min(self.width, self.height) // 3
+
+        if self.faces_dir:
+            fns = sorted(glob.glob(self.faces_dir + "/*.png") + glob.glob(self.faces_dir + "/*.jpg"))
+            self.__patches = [cv2.resize(cv2.imread(fn), (size, size)) for fn in fns]
+        if not self.__patches:
+            self.__patches = [numpy.full((size, size, 3), c, dtype=numpy.uint8) for c in ((200, 80, 80), (80, 200, 80), (80, 80, 200))]
+        return self
+
+    def read(self):
+        if self.count is not None and self.__n >= self.count:
+            return None
+        frame = self.__background.copy()
+        (ph, pw) = self.__patches[0].shape[:2]
+        # the patch moves along a lissajous curve over the frame
+        t = self.__n / 25.0
+        x = int((self.width - pw) * (0.5 + 0.5 * numpy.sin(t * 0.7)))
+        y = int((self.height - ph) * (0.5 + 0.5 * numpy.sin(t * 1.1)))
+        frame[y:y + ph, x:x + pw] = self.__patches[(self.__n // 50) % len(self.__patches)]
+        self.timestamp = self.__n / (self.fps or 25.0)
+        self.__n += 1
+        self._pace()
+        return frame
+
+
+####################################
+###   R E C O R D / R E P L A Y  ###
+####################################
+
+# ring-file layout: header (8 x int64) | timestamps (capacity x float64) | frames (capacity x h x w x c uint8)
+_MAGIC = 0x31434552444346        # "FDCREC1"
+_HEADER = 8
+
+
+def _open_ring(path:str, mode:str, shape:tuple = None, capacity:int = None) -> tuple:
+    """
+    Returns the Tuple (header, timestamps, frames) as numpy memmaps of a ring-file
+    Raises 'FrameSourceError', if the file to read is missing, not a recording or truncated.
+    """
+    if mode == "w+":
+        (h, w, c) = shape
+        # create the file in its final size, then map the parts
+        size = _HEADER * 8 + capacity * 8 + capacity * h * w * c
+        with open(path, "wb") as f:
+            f.truncate(size)
+        header = numpy.memmap(path, dtype=numpy.int64, mode="r+", shape=(_HEADER,))
+        header[:6] = (_MAGIC, h, w, c, capacity, 0)
+    else:
+        if not os.path.isfile(path):
+            raise FrameSourceError("cant open recording: {} not found".format(path))
+        size = os.path.getsize(path)
+        if size < _HEADER * 8:
+            raise FrameSourceError("cant open recording: {} is not a frame recording".format(path))
+        header = numpy.memmap(path, dtype=numpy.int64, mode="r", shape=(_HEADER,))
+        if header[0] != _MAGIC:
+            raise FrameSourceError("cant open recording: {} is not a frame recording".format(path))
+        (h, w, c, capacity) = (int(v) for v in header[1:5])
+        if min(h, w, c, capacity) < 1 or size < _HEADER * 8 + capacity * 8 + capacity * h * w * c:
+            raise FrameSourceError("cant open recording: {} is truncated".format(path))
+
+    fmode = "r+" if mode == "w+" else "r"
+    timestamps = numpy.memmap(path, dtype=numpy.float64, mode=fmode, offset=_HEADER * 8, shape=(capacity,))
+    frames = numpy.memmap(path, dtype=numpy.uint8, mode=fmode, offset=_HEADER * 8 + capacity * 8, shape=(capacity, h, w, c))
+    return (header, timestamps, frames)
+
+
+class Recorder:
+    """
+    Records raw frames with timestamps into a memory-mapped ring-file. When the ring is full, the oldest
+    frames are overwritten; so a recorder can run all day and always holds the last 'capacity' frames.
+    The file is created with the size of the first frame; all frames must have that size.
+    """
+    def __init__(self, path:str, capacity:int = 1000) -> None:
+        self.path:str = path
+        self.capacity:int = capacity
+        self.__ring = None
+
+    def write(self, frame, timestamp:float = None) -> None:
+        if self.__ring is None:
+            self.__ring = _open_ring(self.path, "w+", frame.shape if frame.ndim == 3 else frame.shape + (1,), self.capacity)
+        (header, timestamps, frames) = self.__ring
+        n = int(header[5])
+        slot = n % self.capacity
+        frames[slot] = frame.reshape(frames.shape[1:])
+        timestamps[slot] = time.time() if timestamp is None else timestamp
+        # count last: a reader never sees a slot before it is complete
+        header[5] = n + 1
+
+    def stop(self) -> None:
+        if self.__ring is not None:
+            for m in self.__ring:
+                m.flush()
+            self.__ring = None
+
+
+class ReplaySource (FrameSource):
+    """
+    Plays a ring-file from the Recorder, oldest frame first.
+    realtime: True: with the original timing, False: as fast as possible
+    """
+    def __init__(self, path:str, realtime:bool = True, loop:bool = False) -> None:
+        self.path:str = path
+        self.realtime:bool = realtime
+        self.loop:bool = loop
+        self.__ring = None
+        self.__pos:int = 0
+        self.__first:int = 0
+        self.__count:int = 0
+        self.__t0 = None
+
+    def start(self):
+        self.__ring = _open_ring(self.path, "r")
+        (header, timestamps, frames) = self.__ring
+        self.__count = int(header[5])
+        capacity = len(timestamps)
+        self.__first = max(0, self.__count - capacity)
+        self.__pos = self.__first
+        return self
+
+    def read(self):
+        (header, timestamps, frames) = self.__ring
+        if self.__pos >= self.__count:
+            if not self.loop or self.__count == 0:
+                return None
+            self.__pos = self.__first
+            self.__t0 = None
+
+        slot = self.__pos % len(timestamps)
+        self.__pos += 1
+        self.timestamp = float(timestamps[slot])
+        if self.realtime:
+            # wait until the frame is due, relative to the first frame
+            if self.__t0 is None:
+                self.__t0 = (time.perf_counter(), timestamps[slot])
+            delay = (timestamps[slot] - self.__t0[1]) - (time.perf_counter() - self.__t0[0])
+            if delay > 0:
+                time.sleep(delay)
+        return numpy.array(frames[slot])
+
+    def stop(self) -> None:
+        self.__ring = None
+
+
+def open_source(spec:str, warmup:float = 2.0) -> FrameSource:
+    """
+    Returns the (not yet started) FrameSource for a source-spec:
+      '0', '1', ..           WebCam #n
+      'file:<path>'          video-file (as fast as possible; 'filert:<path>' with the file's frame-rate)
+      'dir:<path>'           image-directory
+      'synthetic[:WxH]'      generated frames; 'synthetic:640x480:<faces_dir>' pastes the images from faces_dir
+      'replay:<path>'        recording, original timing ('replaymax:<path>' as fast as possible)
+      'bus:<name>'           shared-memory frame-bus of a running capture.py
+    Raises 'FrameSourceError' for unknown specs.
+    """
+    (kind, _, arg) = spec.partition(":")
+    if kind.isdigit():
+        return WebcamSource(int(kind), warmup)
+    if kind in ("file", "filert"):
+        return FileSource(arg, realtime=(kind == "filert"))
+    if kind == "dir":
+        return ImageDirSource(arg)
+    if kind == "synthetic":
+        (size, _, faces_dir) = arg.partition(":")
+        (w, _, h) = (size or "640x480").partition("x")
+        if not (w.isdigit() and h.isdigit()):
+            raise FrameSourceError("invalid size '{}' for synthetic frames. Use i.e. synthetic:640x480".format(size))
+        return SyntheticSource(int(w), int(h), faces_dir=faces_dir or None)
+    if kind in ("replay", "replaymax"):
+        return ReplaySource(arg, realtime=(kind == "replay"))
+    if kind == "bus":
+        # imported here: framebus itself builds on this module
+        from utils.framebus import BusSource
+        return BusSource(arg or "facedetect")
+    raise FrameSourceError("unknown frame-source: '{}'".format(spec))
@@ -0,0 +1,160 @@
+##########################################
+####   Incremental Face-Recognizer    ####
+##########################################
+import math
+
+import numpy
+
+
+class IncrementalRecognizer:
+    """
+    A linear classifier for the 128-d face embeddings, which can learn new images and new persons without
+    retraining on the old data. Every person is represented by the mean of its embeddings (nearest class mean);
+    for the (L2-normalized) embeddings this is a linear model with w_c = mean_c and b_c = -|mean_c|^2 / 2.
+    Only the per-person sums and counts are stored, so partial_fit() costs time proportional to the new data.
+
+    predict_proba() is a softmax over the scores; its scale (inverse temperature) is calibrated by minimizing the
+    log-loss on the training-data, each image scored against its own person's mean *without* itself (leave-one-out).
+    The targets are label-smoothed (1 - smoothing for the own person, the rest spread over all persons): on
+    well separated training-data the plain log-loss keeps falling with the scale, and an unknown face would get
+    a probability near 1.0 for its nearest person. Drop-in for train.py's SVC: fit / partial_fit / predict_proba / classes_.
+
+    smoothing: probability mass (0.0..1.0) of the calibration targets not on the own person
+    """
+    # (class attribute: models pickled before it existed fall back to it)
+    smoothing:float = 0.1
+
+    def __init__(self, smoothing:float = 0.1) -> None:
+        self.smoothing:float = smoothing
+        self.classes_ = numpy.array([])
+        self.sums_ = None
+        self.counts_ = None
+        self.scale_:float = 10.0
+        self.n_calibrated_:int = 0
+        # number of partial_fit() calls since the last fit()
+        self.updates_:int = 0
+
+
+    def fit(self, X, y):
+        """
+        (Re)trains from scratch on all embeddings X with labels y. Returns self.
+        """
+        self.classes_ = numpy.array([])
+        self.sums_ = None
+        self.counts_ = None
+        self.scale_ = 10.0
+        self.n_calibrated_ = 0
+        self.partial_fit(X, y)
+        self.updates_ = 0
+        return self
+
+
+    def partial_fit(self, X, y):
+        """
+        Folds new embeddings X with labels y into the model; new labels (persons) are added. Returns self.
+        """
+        X = numpy.asarray(X, dtype=numpy.float64).reshape(len(y), -1)
+        y = numpy.asarray(y)
+
+        # add new classes, keep classes_ sorted (same order as the LabelEncoder)
+        classes = numpy.union1d(self.classes_, y) if len(self.classes_) else numpy.unique(y)
+        if len(classes) != len(self.classes_):
+            sums = numpy.zeros((len(classes), X.shape[1]))
+            counts = numpy.zeros(len(classes))
+            if self.sums_ is not None:
+                idx = numpy.searchsorted(classes, self.classes_)
+                sums[idx] = self.sums_
+                counts[idx] = self.counts_
+            (self.classes_, self.sums_, self.counts_) = (classes, sums, counts)
+
+        # closed-form update of the per-class sums and counts
+        labels = numpy.searchsorted(self.classes_, y)
+        numpy.add.at(self.sums_, labels, X)
+        numpy.add.at(self.counts_, labels, 1)
+
+        self._calibrate(X, labels)
+        self.updates_ += 1
+        return self
+
+
+    def _scores(self, X):
+        """
+        Returns the linear scores (N, classes) before scaling: x . mean_c - |mean_c|^2 / 2
+        """
+        means = self.sums_ / numpy.maximum(self.counts_, 1)[:, None]
+        return X @ means.T - 0.5 * (means * means).sum(axis=1)
+
+
+    def _calibrate(self, X, labels) -> None:
+        """
+        Fits the softmax scale on the batch (leave-one-out scores for the own class) and averages it with the
+        previous scale, weighted by the number of images each was calibrated on.
+        """
+        # images of persons with only one image have no leave-one-out mean
+        own_counts = self.counts_[labels]
+        mask = own_counts > 1
+        if not mask.any() or len(self.classes_) < 2:
+            return
+        (X, labels, own_counts) = (X[mask], labels[mask], own_counts[mask])
+
+        scores = self._scores(X)
+        own = (self.sums_[labels] - X) / (own_counts - 1)[:, None]
+        rows = numpy.arange(len(X))
+        scores[rows, labels] = (X * own).sum(axis=1) - 0.5 * (own * own).sum(axis=1)
+
+        # cross-entropy with the smoothed targets. it grows again for big scales (the other persons' targets are > 0),
+        # so the minimum is finite even on separable data
+        eps = self.smoothing / len(self.classes_)
+        def nll(log_scale:float) -> float:
+            z = math.exp(log_scale) * scores
+            zmax = z.max(axis=1)
+            lse = zmax + numpy.log(numpy.exp(z - zmax[:, None]).sum(axis=1))
+            return float(numpy.mean(lse - (1.0 - self.smoothing) * z[rows, labels] - eps * z.sum(axis=1)))
+
+        # golden-section search for the best scale between 0.1 and 200
+        (a, b) = (math.log(0.1), math.log(200.0))
+        g = (math.sqrt(5) - 1) / 2
+        for _ in range(40):
+            c = b - g * (b - a)
+            d = a + g * (b - a)
+            if nll(c) < nll(d):
+                b = d
+            else:
+                a = c
+        scale = math.exp((a + b) / 2)
+
+        n = len(X)
+        self.scale_ = (self.scale_ * self.n_calibrated_ + scale * n) / (self.n_calibrated_ + n)
+        self.n_calibrated_ += n
+
+
+    def predict_proba(self, X):
+        """
+        Returns the probabilities (N, classes), columns in the order of classes_
+        """
+        z = self.scale_ * self._scores(numpy.asarray(X, dtype=numpy.float64).reshape(-1, self.sums_.shape[1]))
+        z = numpy.exp(z - z.max(axis=1)[:, None])
+        return z / z.sum(axis=1)[:, None]
+
+
+    def unseen_proba(self, X, y) -> float:
+        """
+        Sanity check of the calibration: every person in turn is treated as unknown (scored without its own mean)
+        and the mean of the highest probability its images X get for one of the other persons is returned.
+        Near 1.0 means, a stranger would be recognized as someone with certainty. None for less than 3 persons.
+        """
+        if len(self.classes_) < 3:
+            return None
+        X = numpy.asarray(X, dtype=numpy.float64).reshape(len(y), -1)
+        labels = numpy.searchsorted(self.classes_, numpy.asarray(y))
+        z = self.scale_ * self._scores(X)
+        z[numpy.arange(len(X)), labels] = -numpy.inf
+        z = numpy.exp(z - z.max(axis=1)[:, None])
+        return float(numpy.mean(z.max(axis=1) / z.sum(axis=1)))
+
+
+    def predict(self, X):
+        """
+        Returns the most probable label of every embedding
+        """
+        return self.classes_[numpy.argmax(self._scores(numpy.asarray(X, dtype=numpy.float64).reshape(-1, self.sums_.shape[1])), axis=1)]
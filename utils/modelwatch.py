@@ -0,0 +1,137 @@
+##########################################
+####   Hot-Reload of the Recognizer   ####
+##########################################
+import os
+import pickle
+import threading
+import time
+
+
+class ModelWatchError (Exception):
+    pass
+
+
+def write_pickle_atomic(obj, fn:str) -> None:
+    """
+    Serializes obj into the file fn. The data is written into a temp-file first and then renamed,
+    so a reader (i.e. the ModelWatcher) never sees a half written pickle.
+    """
+    tmpfn = fn + ".tmp"
+    with open(tmpfn, "wb") as f:
+        f.write(pickle.dumps(obj))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmpfn, fn)
+
+
+def load_model(recognizerfn:str, labelencoderfn:str) -> tuple:
+    """
+    Loads the recognizer and the labelencoder from disk. Returns the Tuple (recognizer, labelencoder).
+    Raises 'ModelWatchError', if both files do not belong together (different number of classes).
+    """
+    with open(recognizerfn, "rb") as f:
+        recognizer = pickle.loads(f.read())
+    with open(labelencoderfn, "rb") as f:
+        labelencoder = pickle.loads(f.read())
+
+    if len(recognizer.classes_) != len(labelencoder.classes_):
+        raise ModelWatchError("recognizer knows {} classes, labelencoder {}".format(len(recognizer.classes_), len(labelencoder.classes_)))
+    return (recognizer, labelencoder)
+
+
+class ModelWatcher:
+    """
+    Watches recognizer.pickle and labelencoder.pickle and reloads them in a background thread, whenever
+    train.py has written a new version. The live loop calls get() once per frame and always receives a
+    consistent pair (recognizer, labelencoder); the swap is a single reference assignment, so no frame waits
+    for pickle.loads().
+
+    poll_interval: seconds between two mtime checks
+    settle_time: seconds both files must stay unchanged before they are loaded (train.py writes two files)
+
+    Example:
+        watcher = ModelWatcher(recognizerfn, labelencoderfn).start()
+        while True:
+            (recognizer, labelencoder) = watcher.get()
+            ...
+        watcher.stop()
+    """
+    def __init__(self, recognizerfn:str, labelencoderfn:str, poll_interval:float = 1.0, settle_time:float = 0.5) -> None:
+        self.recognizerfn:str = recognizerfn
+        self.labelencoderfn:str = labelencoderfn
+        self.poll_interval:float = poll_interval
+        self.settle_time:float = settle_time
+        self.version:int = 0
+
+        # the very 1st time: load synchronously, the live loop needs a model
+        self.__stamp = self._get_stamp()
+        # stamp of the files, which could not be loaded (don't retry until they change again)
+        self.__failed = None
+        self.__model = load_model(recognizerfn, labelencoderfn)
+        self.__stopped = threading.Event()
+        self.__thread = None
+
+
+    def _get_stamp(self) -> tuple:
+        """
+        Returns the Tuple (mtime, size) of both model-files. None, if one of the files is missing (i.e. while renaming)
+        """
+        try:
+            r = os.stat(self.recognizerfn)
+            l = os.stat(self.labelencoderfn)
+        except OSError:
+            return None
+        return (r.st_mtime_ns, r.st_size, l.st_mtime_ns, l.st_size)
+
+
+    def start(self):
+        """
+        Starts the background thread. Returns self.
+        """
+        self.__thread = threading.Thread(target=self._update, name="ModelWatcher", daemon=True)
+        self.__thread.start()
+        return self
+
+
+    def _update(self) -> None:
+        """
+        Background loop: poll the files, wait until they have settled and swap in the new model.
+        """
+        while not self.__stopped.wait(self.poll_interval):
+            stamp = self._get_stamp()
+            if stamp is None or stamp == self.__stamp or stamp == self.__failed:
+                continue
+
+            # wait until train.py has finished writing both files
+            time.sleep(self.settle_time)
+            if self._get_stamp() != stamp:
+                continue
+
+            try:
+                model = load_model(self.recognizerfn, self.labelencoderfn)
+            except Exception as e:
+                # keep the old model; try again with the next change
+                print("[WARN] cant reload recognizer: {}".format(str(e)))
+                self.__failed = stamp
+                continue
+
+            self.__model = model
+            self.__stamp = stamp
+            self.version += 1
+            print("[INFO] recognizer reloaded (version {}): {} persons".format(self.version, len(model[1].classes_)))
+
+
+    def get(self) -> tuple:
+        """
+        Returns the currently active Tuple (recognizer, labelencoder).
+        """
+        return self.__model
+
+
+    def stop(self) -> None:
+        """
+        Stops the background thread.
+        """
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
@@ -0,0 +1,108 @@
+##########################################
+####   Motion-Gate for the Live-Loop  ####
+##########################################
+import time
+import cv2
+import numpy
+
+
+class MotionGate:
+    """
+    Cheap change detection in front of the face detector. Every frame is shrunk to a tiny grayscale image and
+    compared with a running background average. The expensive detection + recognition only has to run, if
+    enough pixels changed or the last run is older than max_interval seconds.
+
+    width: width of the downscaled frame in pixels (aspect-ratio is kept)
+    threshold: min. gray-value difference (0..255) for a pixel to count as changed
+    min_area: min. fraction (0.0..1.0) of changed pixels to report motion
+    max_interval: seconds. run detection at least this often, even on a static scene
+    hold_time: seconds. keep the gate open after the last motion (people standing still in front of the camera)
+    alpha: learning rate of the background average
+
+    Example:
+        gate = MotionGate()
+        while True:
+            frame = vs.read()
+            if gate.check(frame):
+                ... detect & recognize ...
+    """
+    def __init__(self, width:int = 160, threshold:int = 25, min_area:float = 0.002, max_interval:float = 2.0, hold_time:float = 1.0, alpha:float = 0.05) -> None:
+        self.width:int = width
+        self.threshold:int = threshold
+        self.min_area:float = min_area
+        self.max_interval:float = max_interval
+        self.hold_time:float = hold_time
+        self.alpha:float = alpha
+
+        self.__background = None
+        self.__mask = None
+        self.__last_run:float = None
+        self.__last_motion:float = None
+
+
+    def _prepare(self, frame):
+        """
+        Returns the downscaled, blurred grayscale version of the frame as float32
+        """
+        (h, w) = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, int(h * self.width / w))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+        return gray.astype(numpy.float32)
+
+
+    def motion(self, frame) -> bool:
+        """
+        Returns True, if the frame differs enough from the background. Updates the background.
+        """
+        gray = self._prepare(frame)
+
+        # the very 1st time (or after a resolution change): init background, report motion
+        if self.__background is None or self.__background.shape != gray.shape:
+            self.__background = gray
+            self.__mask = numpy.full(gray.shape, 255, dtype=numpy.uint8)
+            return True
+
+        diff = cv2.absdiff(gray, self.__background)
+        self.__mask = (diff > self.threshold).astype(numpy.uint8) * 255
+        cv2.accumulateWeighted(gray, self.__background, self.alpha)
+
+        return cv2.countNonZero(self.__mask) > self.min_area * self.__mask.size
+
+
+    def check(self, frame, timestamp:float = None) -> bool:
+        """
+        Returns True, if detection + recognition should run on this frame:
+        on motion, during hold_time after the last motion or if max_interval has passed.
+        timestamp: seconds, time of the frame (i.e. from a recording). None: now
+        """
+        now = time.time() if timestamp is None else timestamp
+        if self.motion(frame):
+            self.__last_motion = now
+
+        # (a looping file or recording starts its timestamps again: time going backwards also runs)
+        run = ((self.__last_motion is not None and 0 <= now - self.__last_motion <= self.hold_time) or
+               self.__last_run is None or not 0 <= now - self.__last_run < self.max_interval)
+        if run:
+            self.__last_run = now
+        return run
+
+
+    def regions(self, pad:float = 0.05) -> list:
+        """
+        Returns the changed areas of the last frame as list of normalized boxes [x0, y0, x1, y1] (0.0..1.0),
+        grown by pad on each side. Empty list, if nothing changed.
+        """
+        if self.__mask is None:
+            return []
+        (mh, mw) = self.__mask.shape[:2]
+        mask = cv2.dilate(self.__mask, None, iterations=2)
+        # [-2] works with the OpenCV 3 and 4 return signatures
+        contours = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+
+        boxes = []
+        for c in contours:
+            (x, y, bw, bh) = cv2.boundingRect(c)
+            boxes.append([max(0.0, x / mw - pad), max(0.0, y / mh - pad),
+                          min(1.0, (x + bw) / mw + pad), min(1.0, (y + bh) / mh + pad)])
+        return boxes
@@ -0,0 +1,183 @@
+##########################################
+####   Sighting Event-Log (SQLite)    ####
+##########################################
+import collections
+import sqlite3
+import threading
+import time
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sightings (
+    id INTEGER PRIMARY KEY,
+    person TEXT NOT NULL,
+    camera TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    best_confidence REAL NOT NULL,
+    frames INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sightings_person ON sightings (person, first_seen);
+CREATE INDEX IF NOT EXISTS sightings_time ON sightings (first_seen);
+"""
+
+
+class SightingLog:
+    """
+    Collapses the per-frame recognitions into sighting intervals (person, first seen, last seen, best confidence,
+    camera) and writes them into a SQLite database. record() is called from the live loop and only updates an
+    in-memory dict; a background thread writes the finished intervals in one transaction every flush_interval seconds.
+
+    max_gap: seconds. a person not seen for longer ends its interval; the next recognition opens a new one
+    The times come from record()'s timestamp (i.e. the frame time of a recording) or the clock. Intervals expire
+    against the newest recorded timestamp plus the wall-clock time since it was recorded.
+    buffer_size: max. finished intervals waiting for the flush. if the disk can't keep up (or the database is
+                 locked / not writable), the intervals stay in the buffer and are retried; when full, the oldest
+                 are dropped (counted in 'dropped')
+
+    Example:
+        log = SightingLog("data/sightings.sqlite", "cam0").start()
+        while True:
+            ...
+            log.record(nickname, proba)
+        log.stop()
+    """
+    def __init__(self, database:str, camera:str = "cam0", max_gap:float = 5.0, flush_interval:float = 5.0, buffer_size:int = 1000) -> None:
+        self.database:str = database
+        self.camera:str = camera
+        self.max_gap:float = max_gap
+        self.flush_interval:float = flush_interval
+        self.dropped:int = 0
+
+        # open intervals: person -> [first_seen, last_seen, best_confidence, frames]
+        self.__open = dict()
+        # (newest timestamp passed to record(), time.time() when it was recorded)
+        self.__clock = None
+        # finished intervals, waiting for the flush-thread
+        self.__buffer = collections.deque(maxlen=buffer_size)
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__thread = None
+
+
+    def start(self):
+        """
+        Creates the database (if not exists) and starts the flush-thread. Returns self.
+        """
+        db = sqlite3.connect(self.database)
+        db.executescript(_SCHEMA)
+        db.close()
+        self.__thread = threading.Thread(target=self._update, name="SightingLog", daemon=True)
+        self.__thread.start()
+        return self
+
+
+    def record(self, person:str, confidence:float, timestamp:float = None) -> None:
+        """
+        Records one recognition of person. Cheap: no I/O, safe to call for every face in every frame.
+        timestamp: seconds, time of the frame. None: now
+        """
+        now = time.time() if timestamp is None else timestamp
+        with self.__lock:
+            self.__clock = (now, time.time())
+            interval = self.__open.get(person)
+            # (a looping recording starts its timestamps again: time going backwards ends the interval, too)
+            if interval is not None and not 0 <= now - interval[1] <= self.max_gap:
+                self._close(person)
+                interval = None
+            if interval is None:
+                self.__open[person] = [now, now, confidence, 1]
+            else:
+                interval[1] = now
+                interval[2] = max(interval[2], confidence)
+                interval[3] += 1
+
+
+    def _close(self, person:str) -> None:
+        """
+        Moves the open interval of person into the flush-buffer. Caller holds the lock.
+        """
+        (first_seen, last_seen, best_confidence, frames) = self.__open.pop(person)
+        if len(self.__buffer) == self.__buffer.maxlen:
+            self.dropped += 1
+        self.__buffer.append((person, self.camera, first_seen, last_seen, best_confidence, frames))
+
+
+    def _take(self, close_all:bool = False) -> list:
+        """
+        Closes the expired (or all) open intervals and returns + clears the flush-buffer.
+        """
+        with self.__lock:
+            now = time.time() if self.__clock is None else self.__clock[0] + time.time() - self.__clock[1]
+            for person in [p for (p, i) in self.__open.items() if close_all or not 0 <= now - i[1] <= self.max_gap]:
+                self._close(person)
+            rows = list(self.__buffer)
+            self.__buffer.clear()
+        return rows
+
+
+    def _giveback(self, rows:list) -> None:
+        """
+        Puts the rows of a failed write back in front of the flush-buffer, for the next try.
+        If there is no room for all, the oldest are dropped.
+        """
+        with self.__lock:
+            rows = rows + list(self.__buffer)
+            overflow = len(rows) - self.__buffer.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+                rows = rows[overflow:]
+            self.__buffer.clear()
+            self.__buffer.extend(rows)
+
+
+    def _flush(self, db, close_all:bool = False) -> bool:
+        """
+        Writes the finished (or all) intervals. Returns False, if the database failed; the rows are kept.
+        """
+        rows = self._take(close_all)
+        try:
+            self._write(db, rows)
+        except sqlite3.Error as e:
+            print("[WARN] cant write sightings: {}".format(str(e)))
+            self._giveback(rows)
+            return False
+        return True
+
+
+    def _write(self, db, rows:list) -> None:
+        """
+        Writes the intervals in one transaction
+        """
+        if not rows:
+            return
+        with db:
+            db.executemany("INSERT INTO sightings (person, camera, first_seen, last_seen, best_confidence, frames) VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+
+    def _update(self) -> None:
+        """
+        Background loop: flush the finished intervals every flush_interval seconds; on stop, all open intervals.
+        """
+        # the connection belongs to this thread
+        db = sqlite3.connect(self.database)
+        db.execute("PRAGMA journal_mode=WAL")
+        while not self.__stopped.wait(self.flush_interval):
+            self._flush(db)
+        # last chance on stop: what can't be written now is lost
+        if not self._flush(db, close_all=True):
+            with self.__lock:
+                self.dropped += len(self.__buffer)
+                self.__buffer.clear()
+        db.close()
+
+
+    def stop(self) -> None:
+        """
+        Ends all open intervals, writes them and stops the flush-thread.
+        """
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+        if self.dropped:
+            print("[WARN] {} sightings dropped (buffer full or database not writable)".format(self.dropped))
@@ -0,0 +1,131 @@
+##########################################
+####   Tiled Face-Detection (SSD)     ####
+##########################################
+import cv2
+import numpy
+
+
+# input size and mean values of the res10 300x300 SSD face detector
+SSD_SIZE = 300
+SSD_MEAN = (104.0, 177.0, 123.0)
+
+
+def nms(boxes, scores, iou_threshold:float = 0.3, smaller:bool = False) -> list:
+    """
+    Non-Maximum-Suppression. Returns the list of indices of the boxes to keep, best score first.
+    boxes: numpy array (N, 4) with [x0, y0, x1, y1]
+    scores: numpy array (N,)
+    smaller: measure the overlap as intersection over the smaller area (not the union): a box mostly inside a
+             better one is suppressed, even if it is much smaller (i.e. a part of a face)
+    """
+    if len(boxes) == 0:
+        return []
+    x0, y0, x1, y1 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x1 - x0) * (y1 - y0)
+    order = numpy.argsort(scores)[::-1]
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(int(i))
+        # intersection of the best box with all remaining boxes at once
+        ix0 = numpy.maximum(x0[i], x0[order[1:]])
+        iy0 = numpy.maximum(y0[i], y0[order[1:]])
+        ix1 = numpy.minimum(x1[i], x1[order[1:]])
+        iy1 = numpy.minimum(y1[i], y1[order[1:]])
+        inter = numpy.maximum(0.0, ix1 - ix0) * numpy.maximum(0.0, iy1 - iy0)
+        if smaller:
+            iou = inter / (numpy.minimum(areas[i], areas[order[1:]]) + 1e-9)
+        else:
+            iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][iou <= iou_threshold]
+    return keep
+
+
+def tile_grid(w:int, h:int, tile:int, overlap:float = 0.25) -> list:
+    """
+    Returns the list of square tiles (x0, y0, x1, y1) in pixels, which cover a frame of w x h pixels.
+    Neighbouring tiles overlap by the fraction 'overlap' of the tile-size, so faces on a border are complete in one tile.
+    """
+    tile = min(tile, w, h)
+    step = max(1, int(tile * (1.0 - overlap)))
+
+    def starts(size:int) -> list:
+        s = list(range(0, max(1, size - tile + 1), step))
+        if s[-1] + tile < size:
+            s.append(size - tile)
+        return s
+
+    return [(x, y, x + tile, y + tile) for y in starts(h) for x in starts(w)]
+
+
+def _intersects(tile:tuple, roi:list, w:int, h:int) -> bool:
+    """
+    Returns True, if the pixel-tile overlaps the normalized roi [x0, y0, x1, y1]
+    """
+    return (tile[0] < roi[2] * w and tile[2] > roi[0] * w and
+            tile[1] < roi[3] * h and tile[3] > roi[1] * h)
+
+
+def select_tiles(w:int, h:int, tile:int, overlap:float = 0.25, rois:list = None, max_tiles:int = 16) -> list:
+    """
+    Returns the tiles to run the detector on. If rois (normalized boxes, i.e. from MotionGate.regions()) are given,
+    only tiles overlapping one of them are used; an empty list means nothing changed: no tiles at all.
+    rois=None: the whole grid. If there are more than max_tiles, the tile-size grows until they fit.
+    """
+    if rois is not None and len(rois) == 0:
+        return []
+    while True:
+        tiles = tile_grid(w, h, tile, overlap)
+        if rois is not None:
+            tiles = [t for t in tiles if any(_intersects(t, r, w, h) for r in rois)]
+        if len(tiles) <= max_tiles or tile >= min(w, h):
+            return tiles
+        tile = int(tile * 1.25)
+
+
+def detect(detector, frame, min_confidence:float, tile:int = SSD_SIZE, overlap:float = 0.25, min_width:int = 1000, rois:list = None, max_tiles:int = 16, iou_threshold:float = 0.3, edge:float = 0.02):
+    """
+    Runs the SSD face detector on the whole frame and on full-resolution tiles, all in one batched forward().
+    Frames narrower than min_width are only detected as a whole (as before), tiling would not help there.
+    rois: see select_tiles(); an empty list runs only the whole-frame pass.
+    edge: tile detections within this fraction of an inner tile edge are cut faces and dropped. A face bigger than
+          the tile overlap is cut in every tile; the whole-frame pass finds it.
+
+    Returns a numpy array (N, 5) of [confidence, x0, y0, x1, y1] with coords normalized to the frame (0.0..1.0),
+    overlapping detections from different tiles merged by NMS (intersection over the smaller box).
+    """
+    (h, w) = frame.shape[:2]
+
+    # 1st image in the batch: the whole frame (finds the big faces); then the tiles (find the small ones)
+    regions = [(0, 0, w, h)]
+    if w >= min_width:
+        regions += select_tiles(w, h, tile, overlap, rois, max_tiles)
+    images = [cv2.resize(frame[y0:y1, x0:x1], (SSD_SIZE, SSD_SIZE)) for (x0, y0, x1, y1) in regions]
+    blob = cv2.dnn.blobFromImages(images, 1.0, (SSD_SIZE, SSD_SIZE), SSD_MEAN, swapRB=False, crop=False)
+    detector.setInput(blob)
+    detections = detector.forward()[0, 0]
+
+    # columns: [image-id, class, confidence, x0, y0, x1, y1] (coords relative to the image in the batch)
+    detections = detections[detections[:, 2] > min_confidence]
+    if len(detections) == 0:
+        return numpy.zeros((0, 5), dtype=numpy.float32)
+
+    # drop the faces cut by an inner tile edge (the frame border is no inner edge; the whole frame has none)
+    regions = numpy.array(regions, dtype=numpy.float32)[detections[:, 0].astype(int)]
+    boxes = numpy.clip(detections[:, 3:7], 0.0, 1.0)
+    cut = (((boxes[:, 0] <= edge) & (regions[:, 0] > 0)) | ((boxes[:, 1] <= edge) & (regions[:, 1] > 0)) |
+           ((boxes[:, 2] >= 1.0 - edge) & (regions[:, 2] < w)) | ((boxes[:, 3] >= 1.0 - edge) & (regions[:, 3] < h)))
+    (detections, regions, boxes) = (detections[~cut], regions[~cut], boxes[~cut])
+    if len(detections) == 0:
+        return numpy.zeros((0, 5), dtype=numpy.float32)
+
+    # map the tile-coords back to the whole frame
+    rw = (regions[:, 2] - regions[:, 0])[:, None]
+    rh = (regions[:, 3] - regions[:, 1])[:, None]
+    boxes[:, [0, 2]] = (regions[:, [0]] + boxes[:, [0, 2]] * rw) / w
+    boxes[:, [1, 3]] = (regions[:, [1]] + boxes[:, [1, 3]] * rh) / h
+
+    # (a partial box of a face from one tile has a small IoU with the whole face: compare with the smaller area)
+    keep = nms(boxes, detections[:, 2], iou_threshold, smaller=True)
+    return numpy.hstack([detections[keep, 2:3], boxes[keep]]).astype(numpy.float32)